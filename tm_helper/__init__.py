@@ -3,4 +3,9 @@ from .datatools  import *
 from .jobs       import *
 from .markets    import *
 from .tmcodes    import *
-from .trademarks import *
\ No newline at end of file
+from .trademarks import *
+from .shards     import *
+from .geo        import *
+from .events     import *
+from .nowcast    import *
+from .pyramid    import *
\ No newline at end of file
@@ -1,12 +1,17 @@
 
 from .tmcodes import TmCodes
+from .shards import TmShardWriter, TmShardLoader
+from .pyramid import TmRollupPyramid
 import matplotlib.pyplot as plt
+import matplotlib.dates as mdates
+from matplotlib.collections import PolyCollection
 import numpy as np
 import datetime as dt
 from sklearn.preprocessing import StandardScaler
 
 import pandas as pd
 from bokeh.plotting import figure
+from concurrent.futures import ThreadPoolExecutor
 
 from statsmodels.tsa.seasonal import seasonal_decompose, STL
 from statsmodels.tsa.x13 import x13_arima_analysis, x13_arima_select_order
@@ -17,6 +22,30 @@ class TmDataTools:
         self._figsize = figsize
 
 
+    def _recession_spans(self, dtype=float):
+        """ Start/stop of each recession
+
+        Parameters
+        ----------
+        dtype : type
+            `float` for fractional years or `datetime.datetime`
+
+        Returns
+        -------
+        Tuple of (start, stop) lists
+        """
+        # Load the recession data
+        self._codes._load_recessions()
+        recessions = self._codes._recessions
+
+        if dtype is float:
+            return list(recessions['start']), list(recessions['stop'])
+
+        start = [dt.datetime(y, m, 15) for y,m in zip(recessions['start_year'], recessions['start_month'])]
+        stop  = [dt.datetime(y, m, 15) for y,m in zip(recessions['stop_year'], recessions['stop_month'])]
+        return start, stop
+
+
     def plot_recessions(self, ax, dtype=float):
         """ Overplot the recession regions
             
@@ -25,22 +54,19 @@ class TmDataTools:
         ax : matplotlib plot axes
             Axes objects of current plot
         """
-        # Load the recession data
-        self._codes._load_recessions()
-
         # Get the x,y axis limits
         ylims = ax.get_ylim()
         xlims = ax.get_xlim()
 
-        # Plot the recession regions
-        for index, row in self._codes._recessions.iterrows():
-            if dtype is float:
-                tmp_xlims = [row.start, row.stop]
-            elif dtype is dt.datetime:
-                tmp_xlims = [dt.datetime(row.start_year, row.start_month, 15),
-                             dt.datetime(row.stop_year, row.stop_month, 15)]
-            plt.fill_between(tmp_xlims, [ylims[0],ylims[0]], [ylims[1],ylims[1]], 
-                             color='lightgray')
+        # Draw all recession regions as a single collection spanning the
+        # full height of the axes
+        start, stop = self._recession_spans(dtype)
+        start = np.asarray(ax.convert_xunits(start), dtype=float)
+        stop  = np.asarray(ax.convert_xunits(stop), dtype=float)
+        verts = [[(x0,0), (x0,1), (x1,1), (x1,0)] for x0,x1 in zip(start, stop)]
+        spans = PolyCollection(verts, facecolors='lightgray', edgecolors='none',
+                               transform=ax.get_xaxis_transform(), zorder=1)
+        ax.add_collection(spans, autolim=False)
         
         # Reset the plot limits
         ax.set_ylim(ylims)
@@ -126,8 +152,9 @@ class TmDataTools:
 
         Parameters
         ----------
-        dframe: pd.DataFrame
-            Pandas DataFrame object containing industry counts data
+        dframe: pd.DataFrame or TmRollupPyramid
+            Pandas DataFrame object containing industry counts data. Passing a
+            `TmRollupPyramid` answers `aggmethod='sum'` from precomputed counts
         min_date: datetime.datetime
             Minimum date (inclusive) for keeping data (default: None)
         max_date: datetime.datetime
@@ -145,6 +172,14 @@ class TmDataTools:
         -------
         Pandas DataFrame containing aggregated, formatted data
         """
+        # Precomputed counts are already trimmed and aggregated
+        if isinstance(dframe, TmRollupPyramid):
+            if aggmethod != 'sum':
+                raise ValueError('TmRollupPyramid only supports aggmethod=\'sum\'')
+            dframe = dframe.query(min_date, max_date, agg=agg or 'D',
+                                  columns=industries)
+            min_date, max_date, agg = None, None, None
+
         # Get the subset of industries to be plotted
         if (industries is not None) and (industries):
             if dframe.index.name != 'fileDate':
@@ -183,7 +218,105 @@ class TmDataTools:
 
         return processed_data
 
-    def plot_industries(self, dframe, recess=True, norm=False, highlight=None):
+    def _lttb(self, x, y, nout):
+        """ Largest-Triangle-Three-Buckets downsampling
+
+        Parameters
+        ----------
+        x: numpy.ndarray
+            Monotonically increasing x values
+        y: numpy.ndarray
+            y values, either 1D or (npts, ncols) to downsample every column
+            at once. NaN values are only selected in buckets without any
+            valid point (the first and last points are always kept).
+        nout: int
+            Number of points to keep
+
+        Returns
+        -------
+        numpy.ndarray of the indices of the points to keep (one column of
+        indices per column of `y` if `y` is 2D)
+        """
+        y = np.asarray(y, dtype=float)
+        squeeze = (y.ndim == 1)
+        y = y.reshape(len(x), -1)
+        npts, ncols = y.shape
+
+        if (nout >= npts) or (nout < 3):
+            index = np.repeat(np.arange(npts)[:,None], ncols, axis=1)
+            return index[:,0] if squeeze else index
+
+        # First/last points are always kept, the rest is split into buckets
+        edges = np.linspace(1, npts-1, nout-1).astype(int)
+        index = np.zeros((nout, ncols), dtype=int)
+        index[-1] = npts - 1
+
+        cols  = np.arange(ncols)
+        valid = ~np.isnan(y)
+        yzero = np.where(valid, y, 0)
+
+        # Last valid point kept in each column (if there is one yet)
+        prev     = np.zeros(ncols, dtype=int)
+        has_prev = valid[0].copy()
+        for b in range(nout-2):
+            lo, hi = edges[b], edges[b+1]
+            next_hi = edges[b+2] if b+2 < len(edges) else npts
+            avg_x = x[hi:next_hi].mean()
+            prev_x, prev_y = x[prev], y[prev, cols]
+            with np.errstate(invalid='ignore', divide='ignore'):
+                avg_y = yzero[hi:next_hi].sum(axis=0) / valid[hi:next_hi].sum(axis=0)
+            # With no valid point in the next bucket, use the previous point
+            avg_y = np.where(np.isnan(avg_y), prev_y, avg_y)
+
+            # Keep the valid point forming the largest triangle with its
+            # neighbors, or the first valid point if there is no previous one
+            area = np.abs((prev_x - avg_x) * (y[lo:hi] - prev_y) -
+                          (prev_x - x[lo:hi,None]) * (avg_y - prev_y))
+            area[:,~has_prev] = 0
+            area[~valid[lo:hi]] = -1
+            best = lo + np.argmax(area, axis=0)
+            index[b+1] = best
+
+            found = valid[best, cols]
+            prev[found] = best[found]
+            has_prev |= found
+
+        return index[:,0] if squeeze else index
+
+
+    def decimate(self, series, max_points=2000, xlim=None):
+        """ Downsample a series to roughly screen resolution with LTTB
+
+        Parameters
+        ----------
+        series: pandas.Series
+            Series to downsample
+        max_points: int
+            Maximum number of points to return
+        xlim: tuple
+            Optional (min,max) index range to keep before downsampling
+
+        Returns
+        -------
+        Pandas Series with at most `max_points` points
+        """
+        series = series.dropna()
+        if xlim is not None:
+            series = series[(series.index >= xlim[0]) & (series.index <= xlim[1])]
+        x = self._xnum(series.index)
+        return series.iloc[self._lttb(x, series.values.astype(float), max_points)]
+
+
+    def _xnum(self, index):
+        """ Numeric x values for an index (matplotlib date numbers for dates)
+        """
+        if isinstance(index, pd.DatetimeIndex):
+            return mdates.date2num(index.to_pydatetime())
+        return np.asarray(index, dtype=float)
+
+
+    def plot_industries(self, dframe, recess=True, norm=False, highlight=None,
+                        backend='pandas', max_points=2000):
         """ Plot the industry breakdown with options. The process is as follows:
 
         Parameters
@@ -192,12 +325,27 @@ class TmDataTools:
             Pandas DataFrame object containing industry counts data
         recess: bool
             Overplot recession dates
+        backend: str
+            Plotting backend. Acceptable values include:
+            * `pandas`    : (Default) Plot the full frame with `DataFrame.plot`
+            * `matplotlib`: Plot LTTB-decimated series and re-decimate on zoom
+            * `bokeh`     : Return a `bokeh` figure of LTTB-decimated series
+        max_points: int
+            Maximum number of points per series for the decimated backends
         """
         # normalize if requested
         plot_data = dframe.copy()
         if norm:
             plot_data = self.scale_data(plot_data) 
 
+        # Decimated backends
+        if backend == 'matplotlib':
+            return self._plot_industries_mpl(plot_data, recess, highlight, max_points)
+        elif backend == 'bokeh':
+            return self._plot_industries_bokeh(plot_data, recess, highlight, max_points)
+        elif backend != 'pandas':
+            raise ValueError(f'Unknown backend: {backend}')
+
         # Now do the plotting
         if highlight is None:
             ax = plot_data.plot(figsize=self._figsize)
@@ -221,15 +369,92 @@ class TmDataTools:
         return ax
 
 
+    def _plot_industries_mpl(self, plot_data, recess, highlight, max_points):
+        """ Matplotlib version of `plot_industries` using decimated series.
+        Zooming or panning re-decimates the visible range.
+        """
+        fig, ax = plt.subplots(figsize=self._figsize)
+        is_date = isinstance(plot_data.index, pd.DatetimeIndex)
+        x = self._xnum(plot_data.index)
+        y = plot_data.values.astype(float)
+
+        # Draw the decimated lines
+        keep = self._lttb(x, y, max_points)
+        lines = []
+        for c,col in enumerate(plot_data.columns):
+            style = dict(label=str(col))
+            if highlight is not None:
+                style = dict(color='red', label=str(col)) if col == highlight else dict(color='gray')
+            lines.extend(ax.plot(x[keep[:,c]], y[keep[:,c],c], **style))
+        if is_date:
+            ax.xaxis_date()
+
+        # Re-decimate the visible range whenever the x-limits change
+        def redecimate(axes):
+            xmin, xmax = axes.get_xlim()
+            lo = max(np.searchsorted(x, xmin) - 1, 0)
+            hi = np.searchsorted(x, xmax) + 1
+            keep = lo + self._lttb(x[lo:hi], y[lo:hi], max_points)
+            for c,line in enumerate(lines):
+                line.set_data(x[keep[:,c]], y[keep[:,c],c])
+            axes.figure.canvas.draw_idle()
+        ax.callbacks.connect('xlim_changed', redecimate)
+
+        # Add y-grid lines, labels and legend
+        ax.yaxis.grid()
+        ax.set_xlabel(plot_data.index.name)
+        ax.legend()
+
+        # Plot recession dates on the plot
+        if recess:
+            self.plot_recessions(ax, dtype=dt.datetime if is_date else float)
+
+        return ax
+
+
+    def _plot_industries_bokeh(self, plot_data, recess, highlight, max_points):
+        """ Bokeh version of `plot_industries` using decimated series
+        """
+        from bokeh.palettes import Category10_10
+
+        is_date = isinstance(plot_data.index, pd.DatetimeIndex)
+        fig = figure(width=int(self._figsize[0]*80), height=int(self._figsize[1]*80),
+                     x_axis_type='datetime' if is_date else 'linear',
+                     x_axis_label=plot_data.index.name,
+                     output_backend='webgl')
+
+        # Draw the decimated lines
+        y = plot_data.values.astype(float)
+        keep = self._lttb(self._xnum(plot_data.index), y, max_points)
+        for c,col in enumerate(plot_data.columns):
+            xc, yc = plot_data.index[keep[:,c]], y[keep[:,c],c]
+            if highlight is None:
+                fig.line(xc, yc, legend_label=str(col), color=Category10_10[c % 10])
+            elif col == highlight:
+                fig.line(xc, yc, legend_label=str(col), color='red')
+            else:
+                fig.line(xc, yc, color='gray')
+
+        # All recession regions in a single glyph
+        if recess:
+            start, stop = self._recession_spans(dt.datetime if is_date else float)
+            fig.quad(left=start, right=stop, bottom=np.nanmin(y), top=np.nanmax(y),
+                     color='lightgray', level='underlay')
+            fig.x_range.start = plot_data.index.min()
+            fig.x_range.end   = plot_data.index.max()
+
+        return fig
+
+
     #def get_subset(self, df,nrows,min_date, max_date):
 
 
 
-    def get_subsets(self, primary_df,
-                    nrows_primary=3,
-                    min_date=dt.datetime(1980,1,1),
-                    max_date=None):
-        """ Chop data from each dataset up into datasets
+    def iter_subsets(self, primary_df,
+                     nrows_primary=3,
+                     min_date=dt.datetime(1980,1,1),
+                     max_date=None):
+        """ Generator version of `get_subsets` that yields one date at a time
 
         Parameters
         ----------
@@ -237,43 +462,119 @@ class TmDataTools:
             Primary dataframe
         nrows_primary: int
             Number of rows 
+        min_date: datetime.datetime
+            Minimum date (inclusive) to generate subsets for
+        max_date: datetime.datetime
+            Maximum date (exclusive) to generate subsets for
+
         Returns
         -------
+        Generator of (values, date) where `values` is a (ncolumns, nrows_primary)
+        array of fractional changes preceding `date`
         """
-        pdf_cpy = primary_df.copy()
+        # Fractional change relative to the previous row (first row unchanged)
+        values = primary_df.values.astype(float)
+        scaled = values.copy()
+        scaled[1:] = (values[1:] - values[:-1]) / np.abs(values[:-1])
 
-        # Normalize the values in the primary dataframe
-        for d,date in enumerate(pdf_cpy.index):
-            if d == 0:
-                continue
-            # Precompute the scaled data values
-            pdf_cpy.iloc[d] = (primary_df.iloc[d] - primary_df.iloc[d-1]) / abs(primary_df.iloc[d-1])
-            
         # Slice the data into subsets
-        datasets = []
-        dates    = []
-        for d,date in enumerate(pdf_cpy.index):
+        for d,date in enumerate(primary_df.index):
             
-            # Skip it if date is too low
-            if date < min_date:
+            # Skip it if date is too low or there aren't enough preceding rows
+            if date < min_date or d < nrows_primary:
                 continue
             # Finish if date is too large
             elif (max_date is not None) and date >= max_date:
                 break
             
-            # Compute the distribution of the lastest nrows
-            start = d-nrows_primary
-            ind_values = []
-            for c,col in enumerate(pdf_cpy.columns):
+            yield scaled[d-nrows_primary:d].T, date
+
+
+    def get_subsets(self, primary_df,
+                    nrows_primary=3,
+                    min_date=dt.datetime(1980,1,1),
+                    max_date=None):
+        """ Chop data from each dataset up into datasets
+
+        Parameters
+        ----------
+        primary_df: pandas.DataFrame()
+            Primary dataframe
+        nrows_primary: int
+            Number of rows 
+        Returns
+        -------
+        """
+        datasets = []
+        dates    = []
+        for values, date in self.iter_subsets(primary_df, nrows_primary, 
+                                              min_date, max_date):
+            datasets.extend(values)
+            dates.extend([date]*len(values))
 
-                primary_vals = pdf_cpy.iloc[start:d,c].values
-                ind_values.append(primary_vals.reshape(-1))
-                dates.append(date)
-                
-            datasets.extend(ind_values)
         return np.array(datasets), dates
 
 
+    def export_subsets(self, primary_df, markets, outdir,
+                       nrows_primary=3,
+                       min_date=dt.datetime(1980,1,1),
+                       max_date=None,
+                       forecast_time=dt.timedelta(weeks=0),
+                       backcast_time=dt.timedelta(weeks=0),
+                       up_or_down=True,
+                       norm=True,
+                       shard_size=100000,
+                       dates_per_chunk=1000):
+        """ Write the output of `get_subsets` and `market_change` to disk in
+        fixed-size shards without holding the full dataset in memory.
+
+        Parameters
+        ----------
+        primary_df: pandas.DataFrame()
+            Primary dataframe (see `get_subsets`)
+        markets: pandas.DataFrame()
+            Market data used to build the labels (see `market_change`)
+        outdir: str
+            Directory the shards will be written to
+        shard_size: int
+            Number of rows per shard
+        dates_per_chunk: int
+            Number of dates whose labels are computed together
+
+        Returns
+        -------
+        `TmShardLoader` for iterating over the written shards
+        """
+        # Normalize the markets once rather than for every chunk
+        if norm:
+            markets = self.scale_data(markets.copy())
+
+        def write_chunk(writer, features, dates):
+            labels = self.market_change(markets, dates, 
+                                        forecast_time=forecast_time,
+                                        backcast_time=backcast_time,
+                                        up_or_down=up_or_down,
+                                        norm=False)
+            ncols = len(features[0])
+            writer.add(np.concatenate(features),
+                       np.repeat(labels, ncols),
+                       np.repeat(np.array(dates, dtype='datetime64[ns]'), ncols))
+
+        with TmShardWriter(outdir, shard_size=shard_size) as writer:
+            features, dates = [], []
+            for values, date in self.iter_subsets(primary_df, nrows_primary,
+                                                  min_date, max_date):
+                features.append(values)
+                dates.append(date)
+                if len(dates) >= dates_per_chunk:
+                    write_chunk(writer, features, dates)
+                    features, dates = [], []
+            if dates:
+                write_chunk(writer, features, dates)
+
+        return TmShardLoader(outdir)
+
+
     def market_change(self, markets, dates, 
                       forecast_time=dt.timedelta(weeks=0),
                       backcast_time=dt.timedelta(weeks=0),
@@ -304,4 +605,253 @@ class TmDataTools:
         if up_or_down:
             labels = np.array([int(l<=0) for l in labels])
 
-        return labels
\ No newline at end of file
+        return labels
+
+
+    def _get_lags(self, lags):
+        """ Convert a `lags` argument into a sorted array of integer lags
+
+        Parameters
+        ----------
+        lags: int or list of int
+            Either the maximum lag (giving `-lags ... lags`) or explicit lags
+        
+        Returns
+        -------
+        numpy.ndarray of integer lags
+        """
+        if np.isscalar(lags):
+            lags = np.arange(-abs(int(lags)), abs(int(lags))+1)
+        return np.unique(np.asarray(lags, dtype=int))
+
+
+    def _standardize(self, values):
+        """ Zero-mean, unit-variance scaling of each column in `values`.
+        Constant columns are returned as zeros.
+        """
+        values = values - values.mean(axis=0)
+        std = values.std(axis=0)
+        std[std == 0] = np.inf
+        return values / std
+
+
+    def _lag_bounds(self, lags, ntimes):
+        """ Row ranges of the overlapping `x` and `y` segments at each lag
+
+        Returns
+        -------
+        Tuple of (x_lo, x_hi, y_lo, y_hi) integer arrays. Lags with no
+        overlap (|lag| >= ntimes) get empty ranges.
+        """
+        x_lo = np.maximum(-lags, 0)
+        x_hi = ntimes - np.maximum(lags, 0)
+        bounds = (x_lo, x_hi, x_lo + lags, x_hi + lags)
+        return tuple(np.clip(b, 0, ntimes) for b in bounds)
+
+
+    def _fft_correlation(self, x, y, lags, chunk_size=2**24):
+        """ Full-sample Pearson correlation of every column of `x` against
+        every column of `y` at each lag. The cross products come from a single
+        FFT per series, the means/variances of each overlapping segment from
+        cumulative sums.
+
+        Parameters
+        ----------
+        x: numpy.ndarray
+            (ntimes, nx) array of primary series
+        y: numpy.ndarray
+            (ntimes, ny) array of secondary series
+        lags: numpy.ndarray
+            Lags to evaluate, positive values mean `x` leads `y`
+        chunk_size: int
+            Approximate number of complex values held in memory at once
+
+        Returns
+        -------
+        numpy.ndarray of shape (nlags, nx, ny)
+        """
+        ntimes = x.shape[0]
+        max_lag = int(np.max(np.abs(lags)))
+        nfft = 1 << int(np.ceil(np.log2(ntimes + max_lag)))
+
+        # Standardizing first keeps the sums well conditioned
+        x = self._standardize(x)
+        y = self._standardize(y)
+
+        # Sums and sums of squares over the overlapping segment of each lag
+        def segment_sums(values, lo, hi):
+            csum  = np.concatenate([np.zeros((1, values.shape[1])), np.cumsum(values, axis=0)])
+            csum2 = np.concatenate([np.zeros((1, values.shape[1])), np.cumsum(values**2, axis=0)])
+            return csum[hi] - csum[lo], csum2[hi] - csum2[lo]
+
+        x_lo, x_hi, y_lo, y_hi = self._lag_bounds(lags, ntimes)
+        overlap = (x_hi - x_lo).astype(float)[:,None,None]
+        sum_x, sum_x2 = segment_sums(x, x_lo, x_hi)
+        sum_y, sum_y2 = segment_sums(y, y_lo, y_hi)
+        var_x = overlap[:,:,0]*sum_x2 - sum_x**2
+        var_y = overlap[:,:,0]*sum_y2 - sum_y**2
+
+        fft_y = np.fft.rfft(y, n=nfft, axis=0)
+
+        # Chunk over the primary series to bound memory usage
+        results = np.empty((len(lags), x.shape[1], y.shape[1]))
+        step = max(1, chunk_size // (nfft * y.shape[1]))
+        for start in range(0, x.shape[1], step):
+            stop = start + step
+            fft_x = np.conj(np.fft.rfft(x[:,start:stop], n=nfft, axis=0))
+            cross = np.fft.irfft(fft_x[:,:,None] * fft_y[:,None,:], n=nfft, axis=0)
+            sum_xy = cross[lags % nfft]
+
+            cov = overlap*sum_xy - sum_x[:,start:stop,None]*sum_y[:,None,:]
+            denom = np.sqrt(var_x[:,start:stop,None] * var_y[:,None,:])
+            with np.errstate(invalid='ignore', divide='ignore'):
+                results[:,start:stop,:] = np.where(denom > 0, cov / denom, np.nan)
+
+        return results
+
+
+    def _rolling_correlation(self, x, y, lags, windows, chunk_size=2**20):
+        """ Mean rolling-window Pearson correlation of every column of `x`
+        against every column of `y` at each lag, using cumulative sums.
+
+        Parameters
+        ----------
+        x: numpy.ndarray
+            (ntimes, nx) array of primary series
+        y: numpy.ndarray
+            (ntimes, ny) array of secondary series
+        lags: numpy.ndarray
+            Lags to evaluate, positive values mean `x` leads `y`
+        windows: list of int
+            Number of rows in each rolling window
+        chunk_size: int
+            Approximate number of values held in memory at once
+
+        Returns
+        -------
+        numpy.ndarray of shape (nwindows, nlags, nx, ny)
+        """
+        def cumsum0(values):
+            return np.concatenate([np.zeros((1,)+values.shape[1:]), np.cumsum(values, axis=0)])
+
+        def window_stats(values, window):
+            # Window sums and inverse standard deviations (0 if constant)
+            csum, csum2 = cumsum0(values), cumsum0(values**2)
+            sums = csum[window:] - csum[:-window]
+            var  = window*(csum2[window:] - csum2[:-window]) - sums**2
+            valid = var > 1e-12*window**2
+            inv_std = np.zeros_like(var)
+            inv_std[valid] = 1/np.sqrt(var[valid])
+            return sums, inv_std, sums*inv_std, valid.astype(float)
+
+        ntimes = x.shape[0]
+        x = self._standardize(x)
+        y = self._standardize(y)
+        windows = [int(w) for w in windows]
+        results = np.full((len(windows), len(lags), x.shape[1], y.shape[1]), np.nan)
+
+        # Statistics of x and y only depend on the window, not on the lag
+        x_stats = [window_stats(x, w) for w in windows]
+        y_stats = [window_stats(y, w) for w in windows]
+
+        x_lo, x_hi, y_lo, y_hi = self._lag_bounds(lags, ntimes)
+        step = max(1, chunk_size // (ntimes * y.shape[1]))
+        for l in range(len(lags)):
+            nrows = x_hi[l] - x_lo[l]
+            if nrows <= 0:
+                continue
+            for start in range(0, x.shape[1], step):
+                stop = start + step
+                x_lag = x[x_lo[l]:x_hi[l],start:stop]
+
+                # The cross products are the only lag-dependent quantity.
+                # Laid out as (ny, ntimes+1, nx) so each market is contiguous.
+                csum_xy = np.zeros((y.shape[1], nrows+1, x_lag.shape[1]))
+                np.multiply(y[y_lo[l]:y_hi[l]].T[:,:,None], x_lag[None,:,:], out=csum_xy[:,1:])
+                np.cumsum(csum_xy[:,1:], axis=1, out=csum_xy[:,1:])
+
+                for w,window in enumerate(windows):
+                    npos = nrows - window + 1
+                    if npos <= 0:
+                        continue
+                    xs = slice(x_lo[l], x_lo[l]+npos)
+                    ys = slice(y_lo[l], y_lo[l]+npos)
+                    _, inv_x, scaled_x, valid_x = (v[xs,start:stop] for v in x_stats[w])
+                    _, inv_y, scaled_y, valid_y = (v[ys] for v in y_stats[w])
+
+                    # Sum over window positions of
+                    #   (window*Sxy - Sx*Sy) / (std_x*std_y)
+                    # where the Sx*Sy term reduces to a matrix product
+                    total = -(scaled_x.T @ scaled_y)
+                    for j in range(y.shape[1]):
+                        sum_xy = csum_xy[j,window:] - csum_xy[j,:-window]
+                        sum_xy *= inv_x
+                        total[:,j] += window * (inv_y[:,j] @ sum_xy)
+
+                    # Average over positions where both windows vary
+                    count = valid_x.T @ valid_y
+                    with np.errstate(invalid='ignore', divide='ignore'):
+                        results[w,l,start:stop,:] = np.where(count > 0, total / count, np.nan)
+
+        return results
+
+
+    def lead_lag_correlation(self, primary_df, markets, lags=52,
+                             windows=None, n_jobs=1):
+        """ Compute the Pearson correlation between every column of
+        `primary_df` (industries or Nice classes) and every market index over
+        a range of lags in a single batched computation.
+
+        Parameters
+        ----------
+        primary_df: pandas.DataFrame
+            Filing counts, one column per industry/Nice class. Missing counts
+            are treated as zero.
+        markets: pandas.DataFrame
+            Market data, one column per index. Should be aggregated to the
+            same dates as `primary_df` (e.g. `get_industries(..., aggmethod='last')`).
+            Dates where any market value is missing are dropped.
+        lags: int or list of int
+            Maximum lag in rows (evaluates `-lags ... lags`) or explicit lags.
+            A positive lag means the `primary_df` column leads the market.
+        windows: list of int
+            Rolling window lengths (in rows). If `None` (default), the full
+            sample correlation is computed via FFT.
+        n_jobs: int
+            Number of threads used to evaluate the lags of the rolling windows
+
+        Returns
+        -------
+        Pandas DataFrame indexed by lag with (primary, market) pair columns.
+        If `windows` is supplied, a dict of such DataFrames keyed by window,
+        each holding the mean correlation over all rolling windows.
+        """
+        # Align the two datasets on their common dates
+        dates = primary_df.index.intersection(markets.dropna().index)
+        x = primary_df.loc[dates].fillna(0).values.astype(float)
+        y = markets.loc[dates].values.astype(float)
+        lags = self._get_lags(lags)
+
+        columns = pd.MultiIndex.from_product([primary_df.columns, markets.columns],
+                                             names=['primary', 'market'])
+        index = pd.Index(lags, name='lag')
+
+        def to_frame(corr):
+            return pd.DataFrame(corr.reshape(len(lags), -1),
+                                index=index, columns=columns)
+
+        # Full sample correlation
+        if windows is None:
+            return to_frame(self._fft_correlation(x, y, lags))
+
+        # Rolling window correlations, with the lags split across threads
+        n_jobs = max(1, min(n_jobs, len(lags)))
+        lag_groups = np.array_split(np.arange(len(lags)), n_jobs)
+
+        def run_lags(group):
+            return self._rolling_correlation(x, y, lags[group], windows)
+
+        with ThreadPoolExecutor(max_workers=n_jobs) as pool:
+            results = np.concatenate(list(pool.map(run_lags, lag_groups)), axis=1)
+
+        return {window: to_frame(results[w]) for w,window in enumerate(windows)}
@@ -0,0 +1,225 @@
+import os
+import numpy as np
+import pandas as pd
+import datetime as dt
+
+from .tmcodes import TmCodes
+
+
+class TmEventLog:
+
+    # Compact on-disk/in-memory record for a single status change
+    dtype = np.dtype([('serial', '<u4'), ('day', '<i4'), ('status', '<u2')])
+
+    def __init__(self, filename=None, buffer_size=100000):
+        """ Append-only log of (serial, date, status) events
+
+        Parameters
+        ----------
+        filename: str
+            Optional file the log is persisted to. Existing events in the
+            file are loaded and new events are appended to it on `flush()`.
+        buffer_size: int
+            Number of pending events kept before they are flushed
+        """
+        self._codes      = TmCodes()
+        self.filename    = filename
+        self.buffer_size = int(buffer_size)
+
+        # Events that have been flushed, and those waiting to be
+        self._events  = [np.zeros(0, dtype=self.dtype)]
+        self._pending = []
+
+        # Serial-sorted index, rebuilt lazily after new events arrive
+        self._sorted = None
+
+        if (filename is not None) and os.path.exists(filename):
+            self._events = [np.fromfile(filename, dtype=self.dtype)]
+
+
+    def __len__(self):
+        return sum(len(e) for e in self._events) + len(self._pending)
+
+
+    def append(self, serial, date, status):
+        """ Record a single status event
+
+        Parameters
+        ----------
+        serial: int
+            Trademark serial number
+        date: datetime.datetime
+            Date of the status change
+        status: int
+            USPTO status code
+        """
+        # Skip events that are missing information
+        if (date is None) or (status is None) or pd.isnull(date):
+            return
+
+        day = (date - dt.datetime(1970,1,1)).days
+        self._pending.append((serial, day, status))
+        if len(self._pending) >= self.buffer_size:
+            self.flush()
+
+        return
+
+
+    def extend(self, serials, dates, statuses):
+        """ Record many status events at once
+
+        Parameters
+        ----------
+        serials: list of int
+            Trademark serial numbers
+        dates: list of datetime.datetime
+            Date of each status change
+        statuses: list of int
+            USPTO status code of each event
+        """
+        self.flush()
+
+        dates    = pd.to_datetime(pd.Series(dates)).values.astype('datetime64[D]')
+        statuses = pd.to_numeric(pd.Series(statuses), errors='coerce').values
+        keep     = ~np.isnat(dates) & ~np.isnan(statuses)
+
+        events = np.zeros(keep.sum(), dtype=self.dtype)
+        events['serial'] = np.asarray(serials)[keep]
+        events['day']    = dates[keep].astype(int)
+        events['status'] = statuses[keep]
+        self._write(events)
+
+        return
+
+
+    def flush(self):
+        """ Move pending events into the log (and the log file, if any)
+        """
+        if self._pending:
+            self._write(np.array(self._pending, dtype=self.dtype))
+            self._pending = []
+        return
+
+
+    def _write(self, events):
+        """ Append an array of events
+        """
+        if len(events) == 0:
+            return
+        self._events.append(events)
+        self._sorted = None
+
+        if self.filename is not None:
+            with open(self.filename, 'ab') as f:
+                events.tofile(f)
+
+        return
+
+
+    def events(self):
+        """ Returns all events sorted by serial number and date
+        """
+        self.flush()
+        if self._sorted is None:
+            events = np.concatenate(self._events)
+            self._events = [events]
+            self._sorted = events[np.lexsort((events['day'], events['serial']))]
+        return self._sorted
+
+
+    def history(self, serial):
+        """ Returns the status history of a single trademark
+
+        Parameters
+        ----------
+        serial: int
+            Trademark serial number
+
+        Returns
+        -------
+        Pandas DataFrame of date, status code and status description
+        """
+        events = self.events()
+
+        # Binary search the serial-sorted index
+        lo = np.searchsorted(events['serial'], serial, side='left')
+        hi = np.searchsorted(events['serial'], serial, side='right')
+        events = events[lo:hi]
+
+        self._codes._load_status()
+        status = self._codes._status.reindex(events['status'].astype(int))
+        return pd.DataFrame({'date':       events['day'].astype('datetime64[D]'),
+                             'status':     events['status'],
+                             'category':   status['status'].values,
+                             'definition': status['definition'].values})
+
+
+    def first_status(self, serials, status='Dead/Abandoned'):
+        """ Date at which each trademark first reached a status category
+
+        Parameters
+        ----------
+        serials: list of int
+            Trademark serial numbers
+        status: str or list of int
+            Status category (see `TmCodes.status_codes`) or explicit codes
+
+        Returns
+        -------
+        numpy.ndarray of `datetime64[D]` dates (`NaT` if never reached)
+        """
+        if isinstance(status, str):
+            status = self._codes.status_codes(status)
+
+        # Events are sorted by (serial,date) so the first match is the earliest
+        events = self.events()
+        events = events[np.isin(events['status'], status)]
+        uniq, first = np.unique(events['serial'], return_index=True)
+
+        serials = np.asarray(serials)
+        dates = np.full(len(serials), np.datetime64('NaT'), dtype='datetime64[D]')
+        if len(uniq) == 0:
+            return dates
+
+        pos = np.clip(np.searchsorted(uniq, serials), 0, len(uniq)-1)
+        found = uniq[pos] == serials
+        dates[found] = events['day'][first[pos[found]]].astype('datetime64[D]')
+        return dates
+
+
+    def share_within(self, filings, days, status='Dead/Abandoned', agg='M',
+                     min_date=None, max_date=None):
+        """ Share of filings from each period that reached `status` within
+        `days` of their filing date, e.g. the abandonment rate.
+
+        Parameters
+        ----------
+        filings: pandas.DataFrame
+            Parsed filings indexed by serial number with a `fileDate` column
+        days: int
+            Number of days after filing to consider
+        status: str or list of int
+            Status category (see `TmCodes.status_codes`) or explicit codes
+        agg: str
+            Aggregation metric passed to `pandas.DataFrame.resample`
+        min_date: datetime.datetime
+            Minimum filing date (inclusive) for keeping data (default: None)
+        max_date: datetime.datetime
+            Maximum filing date (exclusive) for keeping data (default: None)
+
+        Returns
+        -------
+        Pandas Series of the share of filings in each period
+        """
+        filings = filings[filings['fileDate'].notna()]
+        if max_date:
+            filings = filings[filings['fileDate'] < max_date]
+        if min_date:
+            filings = filings[filings['fileDate'] >= min_date]
+
+        file_dates = filings['fileDate'].values.astype('datetime64[D]')
+        reached = self.first_status(filings.index.values, status=status)
+        within  = (reached - file_dates) <= np.timedelta64(int(days), 'D')
+
+        share = pd.Series(within.astype(float), index=pd.DatetimeIndex(file_dates, name='fileDate'))
+        return share.resample(agg).mean()
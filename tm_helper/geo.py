@@ -0,0 +1,197 @@
+import numpy as np
+import pandas as pd
+
+from .datatools import TmDataTools
+
+
+class TmGeoTools(TmDataTools):
+
+    def __init__(self, figsize=(12,7)):
+        super().__init__(figsize=figsize)
+
+
+    def _encode_regions(self, dframe, level):
+        """ Dictionary-encode the owner location of each filing
+
+        Parameters
+        ----------
+        dframe: pandas.DataFrame
+            Parsed filings (see `TmParser.parse_cases`)
+        level: str
+            One of `state`, `country` or `city`
+
+        Returns
+        -------
+        Tuple of (codes, labels) where `codes` holds the position of each row
+        in `labels` (-1 if the location is unknown)
+        """
+        if level == 'state':
+            codes  = self._codes.encode_states(dframe['state'].values)
+            labels = pd.Index(self._codes._states['abbr'], name='state')
+        elif level == 'country':
+            codes  = self._codes.encode_countries(dframe['country'].values)
+            labels = pd.Index(self._codes._countries.index, name='country')
+        elif level == 'city':
+            # No lookup table for cities, so encode the (city,state,country) triplets
+            locs = dframe[['city','state','country']].astype(object)
+            locs = locs.where(locs.notna(), '')
+            codes, labels = pd.MultiIndex.from_frame(locs).factorize()
+            codes[(locs['city'] == '').values] = -1
+        else:
+            raise ValueError(f'Unknown level: {level}')
+
+        return np.asarray(codes), labels
+
+
+    def _encode_classes(self, nice_codes, classes):
+        """ Encode Nice classifications either directly or by industry
+
+        Parameters
+        ----------
+        nice_codes: numpy.ndarray
+            Nice classification of each row
+        classes: str
+            Either `nice` or `industry`
+
+        Returns
+        -------
+        Tuple of (codes, labels)
+        """
+        if classes == 'nice':
+            self._codes._load_nice_classes()
+            labels = pd.Index(self._codes._nice_classes.index, name='niceClass')
+            codes  = labels.get_indexer(nice_codes)
+        elif classes == 'industry':
+            self._codes._load_industries()
+            ids    = self._codes.nice_to_industries(nice_codes)
+            codes  = self._codes._industries.index.get_indexer(ids)
+            labels = pd.Index(self._codes._industries['name'].values, name='industry')
+        else:
+            raise ValueError(f'Unknown classes: {classes}')
+
+        return np.asarray(codes), labels
+
+
+    def rollup(self, dframe, level='state', agg='W', classes='industry',
+               min_date=None, max_date=None):
+        """ Count filings by region, period and industry in a single pass
+
+        Parameters
+        ----------
+        dframe: pandas.DataFrame
+            Parsed filings with `fileDate`, `niceClass` and location columns
+        level: str
+            Geographic level: `state` (default), `country` or `city`
+        agg: str
+            Period frequency, e.g. `D`, `W`, `M`, `Q` or `Y`
+        classes: str
+            Count by `industry` (default) or `nice` classification
+        min_date: datetime.datetime
+            Minimum date (inclusive) for keeping data (default: None)
+        max_date: datetime.datetime
+            Maximum date (exclusive) for keeping data (default: None)
+
+        Returns
+        -------
+        Tuple of (counts, regions, periods, industries) where `counts` is a
+        (nregions, nperiods, nindustries) integer array
+        """
+        # Only keep filings with a valid date and classification
+        filings = dframe[dframe['fileDate'].notna() & dframe['niceClass'].notna()]
+        if max_date:
+            filings = filings[filings['fileDate'] < max_date]
+        if min_date:
+            filings = filings[filings['fileDate'] >= min_date]
+
+        # Nothing left to count, so there are no periods
+        if len(filings) == 0:
+            regions    = self._encode_regions(filings, level)[1]
+            industries = self._encode_classes(np.zeros(0, dtype=int), classes)[1]
+            return (np.zeros((len(regions), 0, len(industries)), dtype=int), regions,
+                    pd.DatetimeIndex([], name='fileDate'), industries)
+
+        # One row per (filing, classification)
+        nclasses = filings['niceClass'].map(len).values
+        nice     = np.concatenate([np.asarray(c, dtype=int) for c in filings['niceClass']]
+                                  + [np.zeros(0, dtype=int)])
+
+        # Encode each dimension
+        region_codes, regions = self._encode_regions(filings, level)
+        region_codes = np.repeat(region_codes, nclasses)
+        class_codes, industries = self._encode_classes(nice, classes)
+
+        periods = pd.DatetimeIndex(filings['fileDate']).to_period(agg)
+        period_range = pd.period_range(periods.min(), periods.max(), freq=periods.freq)
+        period_codes = np.repeat(periods.asi8 - period_range[0].ordinal, nclasses)
+
+        # Drop unknown locations/classes and count everything with one bincount
+        keep = (region_codes >= 0) & (class_codes >= 0)
+        shape = (len(regions), len(period_range), len(industries))
+        flat = np.ravel_multi_index((region_codes[keep], period_codes[keep],
+                                     class_codes[keep]), shape)
+        counts = np.bincount(flat, minlength=np.prod(shape)).reshape(shape)
+
+        # Label periods the same way `resample` does
+        period_labels = period_range.to_timestamp(how='end').normalize()
+        period_labels.name = 'fileDate'
+
+        return counts, regions, period_labels, industries
+
+
+    def get_regions(self, dframe, level='state', regions=None,
+                    min_date=None, max_date=None, agg='W', classes='industry',
+                    norm=True, method='stl', plot_deseason=False):
+        """ Region x period x industry filing counts with the same options as
+        `get_industries`.
+
+        Parameters
+        ----------
+        dframe: pd.DataFrame
+            Parsed filings with `fileDate`, `niceClass` and location columns
+        level: str
+            Geographic level: `state` (default), `country` or `city`
+        regions: list
+            Specific regions to keep (default: all regions with filings)
+        min_date: datetime.datetime
+            Minimum date (inclusive) for keeping data (default: None)
+        max_date: datetime.datetime
+            Maximum date (exclusive) for keeping data (default: None)
+        agg: str
+            Period frequency, e.g. `W`, `M` or `Q`
+        classes: str
+            Count by `industry` (default) or `nice` classification
+        norm: bool
+            Whether to normalize the final distributions
+        method: str
+            Method for removing seasonal variations in the data (see `TmDataTools.deseason()`).
+
+        Returns
+        -------
+        Pandas DataFrame indexed by period with (region, industry) columns
+        """
+        counts, region_labels, periods, industries = self.rollup(
+            dframe, level=level, agg=agg, classes=classes,
+            min_date=min_date, max_date=max_date)
+
+        # Select the requested regions, otherwise those with any filings
+        if regions is not None:
+            sel = region_labels.get_indexer(regions)
+            if np.any(sel < 0):
+                raise ValueError(f'Unknown regions: {list(np.asarray(regions)[sel < 0])}')
+        else:
+            sel = np.flatnonzero(counts.sum(axis=(1,2)) > 0)
+        counts = counts[sel]
+
+        columns = pd.MultiIndex.from_product([region_labels[sel], industries])
+        counts = counts.transpose(1,0,2).reshape(len(periods), len(columns))
+        processed_data = pd.DataFrame(counts.astype(float), index=periods, columns=columns)
+
+        # Remove seasonal affects in the data
+        processed_data = self.deseason(processed_data, method=method,
+                                       doplot=plot_deseason)
+
+        # Check if we want to normalize
+        if norm:
+            processed_data = self.scale_data(processed_data)
+
+        return processed_data
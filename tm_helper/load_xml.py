@@ -58,6 +58,15 @@ class TmParser():
         except:
             row['status'] = None
 
+        # ==========
+        # Status date (may not be valid)
+        # ==========
+        try:
+            date_time_str = self.parse_text('status-date', case_txt)[0]
+            row['statusDate'] = dt.datetime.strptime(date_time_str, '%Y%m%d')
+        except:
+            row['statusDate'] = None
+
         # ==========
         # Filing date (may not be valid)
         # ==========
@@ -150,7 +159,19 @@ class TmParser():
         return row
 
 
-    def parse_cases(self, filename):
+    def parse_cases(self, filename, events=None, pyramid=None):
+        """ Parse all cases in `filename`
+
+        Parameters
+        ----------
+        filename : str
+            TDXF xml file to parse
+        events : TmEventLog
+            Optional event log that every (serial, date, status) is appended
+            to, preserving the status history of repeated serial numbers
+        pyramid : TmRollupPyramid
+            Optional rollup pyramid that the parsed filings are added to
+        """
         # Initialize the dataframe to store the result
         data = dict()
 
@@ -180,6 +201,11 @@ class TmParser():
                         serialNum = row.pop('serialNum')
                         data[serialNum] = row
 
+                        # Record the status change
+                        if events is not None:
+                            date = row['statusDate'] or row['registrationDate'] or row['fileDate']
+                            events.append(serialNum, date, row['status'])
+
                     cnt += 1
                     if (cnt % 100 == 0) and self.verbose:
                         print(f'\rProcessed: {cnt: 8}', end='', flush=True)
@@ -187,6 +213,10 @@ class TmParser():
                     case_txt += line
 
         # Write the final number processed
+        if events is not None:
+            events.flush()
+        if (pyramid is not None) and data:
+            pyramid.update_filings(pd.DataFrame.from_dict(data, orient='index'))
         if self.verbose:
             print(f'\rFINAL processed: {cnt}')
 
@@ -199,7 +229,7 @@ class TmParser():
         """
         """
         # Define the column names
-        col_names = ['fileDate','registrationDate','status','serialNum','markId','descrip','niceClass','city','state','country']
+        col_names = ['fileDate','registrationDate','status','statusDate','serialNum','markId','descrip','niceClass','city','state','country']
         # for i in range(1,46):
         #     col_names.append(f'{i:03d}')
         return col_names
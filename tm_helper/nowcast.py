@@ -0,0 +1,233 @@
+import json
+import numpy as np
+import pandas as pd
+
+from .tmcodes import TmCodes
+
+
+class TmNowcast:
+
+    # Number of seasonal slots for each aggregation
+    _nseasons = {'D': 366, 'W': 53, 'M': 12, 'Q': 4}
+
+    def __init__(self, industries, agg='W', alpha=0.1, gamma=0.1):
+        """ Streaming industry indicator that is updated one day at a time
+
+        Parameters
+        ----------
+        industries: list
+            Names of the industries (or Nice classes) being tracked
+        agg: str
+            Aggregation period: `D`, `W` (default), `M` or `Q`
+        alpha: float
+            Smoothing factor for the level used in the seasonal adjustment
+        gamma: float
+            Smoothing factor for the seasonal component of each period
+        """
+        if agg not in self._nseasons:
+            raise ValueError(f'Unsupported aggregation: {agg}')
+
+        self._codes     = TmCodes()
+        self.industries = list(industries)
+        self.agg        = agg
+        self.alpha      = alpha
+        self.gamma      = gamma
+
+        nind = len(self.industries)
+
+        # Running aggregate for the period currently being filled
+        self._period = None
+        self._counts = np.zeros(nind)
+
+        # Seasonal adjustment state (additive Holt-Winters without trend)
+        self._level    = None
+        self._seasonal = np.zeros((self._nseasons[agg], nind))
+        self._seen     = np.zeros(self._nseasons[agg], dtype=bool)
+
+        # Welford running statistics of the seasonally adjusted values
+        self._n    = 0
+        self._mean = np.zeros(nind)
+        self._m2   = np.zeros(nind)
+
+        # Most recently completed period
+        self._last_period = None
+        self._last_value  = np.full(nind, np.nan)
+        self._last_zscore = np.full(nind, np.nan)
+        self._last_recess = 0
+
+
+    def _season(self, period):
+        """ Seasonal slot of a `pandas.Period`
+        """
+        if self.agg == 'D':
+            return period.dayofyear - 1
+        elif self.agg == 'W':
+            return period.end_time.isocalendar()[1] - 1
+        elif self.agg == 'M':
+            return period.month - 1
+        return period.quarter - 1
+
+
+    def update(self, date, counts):
+        """ Add the filing counts for a single day
+
+        Parameters
+        ----------
+        date: datetime.datetime
+            Date the counts belong to
+        counts: pandas.Series or dict
+            Number of filings for each industry on `date`
+        """
+        period = pd.Period(date, freq=self.agg)
+        if self._period is None:
+            self._period = period
+        elif period < self._period:
+            raise ValueError(f'{date} is before the current period {self._period}')
+
+        # Close out every period that has finished (empty ones count as zero)
+        while self._period < period:
+            self._close_period()
+            self._period += 1
+
+        counts = pd.Series(counts, dtype=float).reindex(self.industries).fillna(0)
+        self._counts += counts.values
+
+        return
+
+
+    def ingest(self, dframe):
+        """ Add every row of a DataFrame of daily counts
+
+        Parameters
+        ----------
+        dframe: pandas.DataFrame
+            Daily filing counts indexed by date with one column per industry
+        """
+        for date, row in zip(dframe.index, dframe[self.industries].values):
+            self.update(date, dict(zip(self.industries, row)))
+        return
+
+
+    def _close_period(self):
+        """ Seasonally adjust the finished period and update the statistics
+        """
+        value  = self._counts
+        season = self._season(self._period)
+
+        # Update the level and seasonal components
+        if self._level is None:
+            self._level = value.copy()
+        else:
+            self._level += self.alpha * (value - self._seasonal[season] - self._level)
+
+        if self._seen[season]:
+            self._seasonal[season] += self.gamma * (value - self._level - self._seasonal[season])
+        else:
+            self._seasonal[season] = value - self._level
+            self._seen[season] = True
+        adjusted = value - self._seasonal[season]
+
+        # Welford update of the mean/variance
+        self._n += 1
+        delta = adjusted - self._mean
+        self._mean += delta / self._n
+        self._m2 += delta * (adjusted - self._mean)
+
+        # Store the latest indicator values
+        self._last_period = self._period
+        self._last_value  = adjusted
+        if self._n > 1:
+            std = np.sqrt(self._m2 / (self._n - 1))
+            with np.errstate(invalid='ignore', divide='ignore'):
+                self._last_zscore = np.where(std > 0, (adjusted - self._mean) / std, 0.0)
+        self._last_recess = int(self._codes.is_recession(self._period.start_time.to_pydatetime())[0])
+
+        self._counts = np.zeros(len(self.industries))
+        return
+
+
+    def latest(self):
+        """ Returns the indicator for the most recently completed period
+
+        Returns
+        -------
+        Pandas DataFrame with the seasonally adjusted value and z-score of each
+        industry, plus the period and its recession flag in `attrs`
+        """
+        latest = pd.DataFrame({'value':  self._last_value,
+                               'zscore': self._last_zscore},
+                              index=pd.Index(self.industries, name='industry'))
+        latest.attrs['period']    = self._last_period
+        latest.attrs['recession'] = self._last_recess
+        return latest
+
+
+    def save(self, filename):
+        """ Save the indicator state to a JSON file
+
+        Parameters
+        ----------
+        filename: str
+            Output file name
+        """
+        def period_str(period):
+            return None if period is None else str(period)
+
+        state = {'industries':  self.industries,
+                 'agg':         self.agg,
+                 'alpha':       self.alpha,
+                 'gamma':       self.gamma,
+                 'period':      period_str(self._period),
+                 'counts':      self._counts.tolist(),
+                 'level':       None if self._level is None else self._level.tolist(),
+                 'seasonal':    self._seasonal.tolist(),
+                 'seen':        self._seen.tolist(),
+                 'n':           self._n,
+                 'mean':        self._mean.tolist(),
+                 'm2':          self._m2.tolist(),
+                 'last_period': period_str(self._last_period),
+                 'last_value':  self._last_value.tolist(),
+                 'last_zscore': self._last_zscore.tolist(),
+                 'last_recess': self._last_recess}
+
+        with open(filename, 'w') as f:
+            json.dump(state, f)
+
+        return
+
+
+    @classmethod
+    def load(cls, filename):
+        """ Restore an indicator from a file written by `save()`
+
+        Parameters
+        ----------
+        filename: str
+            File written by `TmNowcast.save()`
+
+        Returns
+        -------
+        `TmNowcast` object
+        """
+        with open(filename, 'r') as f:
+            state = json.load(f)
+
+        def to_period(value):
+            return None if value is None else pd.Period(value, freq=state['agg'])
+
+        nowcast = cls(state['industries'], agg=state['agg'],
+                      alpha=state['alpha'], gamma=state['gamma'])
+        nowcast._period      = to_period(state['period'])
+        nowcast._counts      = np.array(state['counts'], dtype=float)
+        nowcast._level       = None if state['level'] is None else np.array(state['level'])
+        nowcast._seasonal    = np.array(state['seasonal'], dtype=float)
+        nowcast._seen        = np.array(state['seen'], dtype=bool)
+        nowcast._n           = state['n']
+        nowcast._mean        = np.array(state['mean'], dtype=float)
+        nowcast._m2          = np.array(state['m2'], dtype=float)
+        nowcast._last_period = to_period(state['last_period'])
+        nowcast._last_value  = np.array(state['last_value'], dtype=float)
+        nowcast._last_zscore = np.array(state['last_zscore'], dtype=float)
+        nowcast._last_recess = state['last_recess']
+
+        return nowcast
@@ -0,0 +1,311 @@
+import numpy as np
+import pandas as pd
+
+from .tmcodes import TmCodes
+
+
+class TmRollupPyramid:
+
+    def __init__(self, columns=None, aggs=('W','M','Q','Y')):
+        """ Precomputed daily -> weekly -> monthly -> quarterly -> yearly
+        filing counts with prefix sums for fast range queries.
+
+        Parameters
+        ----------
+        columns: list
+            Names of the count columns (Nice classes/industries). If `None`
+            they are taken from the first call to `update()`.
+        aggs: tuple of str
+            Period frequencies to precompute on top of the daily counts
+        """
+        self._codes  = TmCodes()
+        self.columns = None if columns is None else list(columns)
+        self.aggs    = tuple(aggs)
+
+        # Daily counts, starting from `_start`, and their prefix sums
+        self._start  = None
+        self._daily  = np.zeros((0, 0 if columns is None else len(columns)))
+        self._prefix = np.zeros((1, self._daily.shape[1]))
+
+        # Each level stores (period labels, first day of each period, counts)
+        self._levels = dict()
+
+        # Serial numbers already counted by `update_filings`
+        self._serials = np.zeros(0, dtype=np.int64)
+
+
+    def __len__(self):
+        return len(self._daily)
+
+
+    def _day_index(self, date):
+        """ Number of days between `_start` and `date` (rounded up)
+        """
+        return int((pd.Timestamp(date).ceil('D') - self._start).days)
+
+
+    def update(self, dframe):
+        """ Add filing counts and update every level of the pyramid
+
+        Parameters
+        ----------
+        dframe: pandas.DataFrame
+            Counts indexed by (or with a column) `fileDate`, with one column
+            per Nice class/industry. Rows on the same day are summed.
+        """
+        if 'fileDate' in dframe.columns:
+            dframe = dframe.set_index('fileDate')
+        if self.columns is None:
+            self.columns = list(dframe.columns)
+            self._daily  = np.zeros((0, len(self.columns)))
+            self._prefix = np.zeros((1, len(self.columns)))
+
+        dframe = dframe[dframe.index.notna()]
+        if len(dframe) == 0:
+            return
+        days   = pd.DatetimeIndex(dframe.index).normalize()
+        values = dframe[self.columns].fillna(0).values.astype(float)
+
+        # Grow the daily array to cover the new dates
+        rebuild = False
+        if self._start is None:
+            self._start = days.min()
+        if days.min() < self._start:
+            pad = (self._start - days.min()).days
+            self._daily = np.vstack([np.zeros((pad, len(self.columns))), self._daily])
+            self._start = days.min()
+            self._levels = dict()
+            rebuild = True
+        ndays = (days.max() - self._start).days + 1
+        if ndays > len(self._daily):
+            pad = ndays - len(self._daily)
+            self._daily = np.vstack([self._daily, np.zeros((pad, len(self.columns)))])
+
+        # Add the new counts
+        index = np.asarray((days - self._start).days)
+        np.add.at(self._daily, index, values)
+
+        # Only everything after the first modified day needs to be updated
+        self._update_levels(0 if rebuild else int(index.min()))
+
+        return
+
+
+    def update_filings(self, filings):
+        """ Add parsed filings, counting each Nice class and industry.
+        Filings whose serial number has already been counted (e.g. status
+        updates in later daily files) are skipped.
+
+        Parameters
+        ----------
+        filings: pandas.DataFrame
+            Parsed filings (see `TmParser.parse_cases`) indexed by serial
+            number with `fileDate` and `niceClass` columns
+        """
+        filings = filings[filings['fileDate'].notna() & filings['niceClass'].notna()]
+
+        # Only count each serial number once
+        serials = np.asarray(filings.index, dtype=np.int64)
+        new = ~np.isin(serials, self._serials)
+        filings = filings[new]
+        self._serials = np.union1d(self._serials, serials[new])
+        if len(filings) == 0:
+            return
+        nclasses = filings['niceClass'].map(len).values
+        nice     = np.concatenate([np.asarray(c, dtype=int) for c in filings['niceClass']]
+                                  + [np.zeros(0, dtype=int)])
+        dates    = np.repeat(filings['fileDate'].values, nclasses)
+
+        # One-hot encode the classes and the industries they belong to
+        self._codes._load_nice_classes()
+        self._codes._load_industries()
+        nice_cols = list(self._codes._nice_classes.index)
+        ind_ids   = self._codes.nice_to_industries(nice)
+        ind_cols  = list(self._codes._industries.index)
+
+        counts = np.zeros((len(nice), len(nice_cols) + len(ind_cols)))
+        rows   = np.arange(len(nice))
+        counts[rows, pd.Index(nice_cols).get_indexer(nice)] = 1
+        counts[rows, len(nice_cols) + pd.Index(ind_cols).get_indexer(ind_ids)] = 1
+
+        columns = nice_cols + list(self._codes._industries.loc[ind_cols, 'name'])
+        self.update(pd.DataFrame(counts, index=pd.DatetimeIndex(dates, name='fileDate'),
+                                 columns=columns))
+        return
+
+
+    def _update_levels(self, first_day=0):
+        """ Recompute prefix sums and levels from `first_day` onwards
+        """
+        # Prefix sums
+        first_day = min(first_day, len(self._prefix)-1)
+        prefix = np.zeros((len(self._daily)+1, len(self.columns)))
+        prefix[:first_day+1] = self._prefix[:first_day+1]
+        prefix[first_day+1:] = prefix[first_day] + np.cumsum(self._daily[first_day:], axis=0)
+        self._prefix = prefix
+
+        # Aggregated levels, including any built on demand by `query()`
+        for agg in list(self.aggs) + [a for a in self._levels if a not in self.aggs]:
+            self._build_level(agg, first_day)
+
+        return
+
+
+    def _build_level(self, agg, first_day=0):
+        """ Build (or update from `first_day`) the counts for one frequency
+        """
+        days = pd.date_range(self._start, periods=len(self._daily), freq='D')
+
+        # Multiples such as `2W` group base periods the way `resample` does:
+        # the first period on its own, then every `n` periods after it
+        freq    = pd.Period(self._start, freq=agg).freq
+        periods = days.to_period(freq.base)
+        groups  = (periods.asi8 - periods.asi8[0] + freq.n - 1) // freq.n
+        starts  = np.flatnonzero(np.r_[True, groups[1:] != groups[:-1]])
+
+        # Label each group with the end of its last period, like `resample`
+        shift  = np.where(groups[starts] == 0, 0, freq.n - 1)
+        labels = (periods[starts] + shift).to_timestamp(how='end').normalize()
+        labels.name = 'fileDate'
+
+        # First period affected by the update
+        old = self._levels.get(agg)
+        if (old is None) or (len(old[0]) == 0) or (old[0][0] != labels[0]):
+            first = 0
+        else:
+            first = min(np.searchsorted(starts, first_day, side='right') - 1, len(old[2]))
+
+        counts = np.empty((len(starts), len(self.columns)))
+        if first > 0:
+            counts[:first] = old[2][:first]
+        counts[first:] = np.add.reduceat(self._daily[starts[first]:],
+                                         starts[first:] - starts[first], axis=0)
+
+        self._levels[agg] = (labels, starts, counts)
+
+        return self._levels[agg]
+
+
+    def range_sum(self, min_date=None, max_date=None):
+        """ Total counts of each column between two dates in constant time
+
+        Parameters
+        ----------
+        min_date: datetime.datetime
+            Minimum date (inclusive) (default: None)
+        max_date: datetime.datetime
+            Maximum date (exclusive) (default: None)
+
+        Returns
+        -------
+        Pandas Series of the counts in each column
+        """
+        lo, hi = self._day_range(min_date, max_date)
+        return pd.Series(self._prefix[hi] - self._prefix[lo], index=self.columns)
+
+
+    def _day_range(self, min_date, max_date):
+        """ Daily index range [lo,hi) covered by `min_date` and `max_date`
+        """
+        if self._start is None:
+            return 0, 0
+        lo = 0 if min_date is None else self._day_index(min_date)
+        hi = len(self._daily) if max_date is None else self._day_index(max_date)
+        lo = int(np.clip(lo, 0, len(self._daily)))
+        hi = int(np.clip(hi, lo, len(self._daily)))
+        return lo, hi
+
+
+    def query(self, min_date=None, max_date=None, agg='W', columns=None):
+        """ Counts aggregated by `agg` between two dates. Equivalent to
+        trimming the daily counts and calling `resample(agg).sum()`.
+
+        Parameters
+        ----------
+        min_date: datetime.datetime
+            Minimum date (inclusive) (default: None)
+        max_date: datetime.datetime
+            Maximum date (exclusive) (default: None)
+        agg: str
+            Frequency, e.g. `D`, `W`, `M`, `Q` or `Y`
+        columns: list
+            Subset of columns to return (default: all)
+
+        Returns
+        -------
+        Pandas DataFrame of counts indexed by `fileDate`
+        """
+        lo, hi = self._day_range(min_date, max_date)
+        cols = slice(None) if not columns else pd.Index(self.columns or []).get_indexer(columns)
+        names = (self.columns or []) if not columns else list(columns)
+        if columns and np.any(cols < 0):
+            raise KeyError(f'Unknown columns: {[c for c,i in zip(columns, cols) if i < 0]}')
+
+        if hi <= lo:
+            counts = np.zeros((0, len(names)))
+            index  = pd.DatetimeIndex([], name='fileDate')
+        elif agg == 'D':
+            counts = self._daily[lo:hi][:,cols]
+            index  = pd.date_range(self._start + pd.Timedelta(days=lo), periods=hi-lo,
+                                   freq='D', name='fileDate')
+        else:
+            labels, starts, counts = self._levels.get(agg) or self._build_level(agg)
+
+            # Periods touched by the query
+            k_lo = np.searchsorted(starts, lo, side='right') - 1
+            k_hi = np.searchsorted(starts, hi-1, side='right') - 1
+            counts = counts[k_lo:k_hi+1].copy()
+
+            # Partially covered periods at either end come from the prefix sums
+            first_end  = starts[k_lo+1] if k_lo+1 < len(starts) else len(self._daily)
+            counts[0]  = self._prefix[min(first_end, hi)] - self._prefix[lo]
+            counts[-1] = self._prefix[hi] - self._prefix[max(starts[k_hi], lo)]
+            counts = counts[:,cols]
+            index  = labels[k_lo:k_hi+1]
+
+        return pd.DataFrame(counts, index=index, columns=names)
+
+
+    def save(self, filename):
+        """ Save the daily counts to a `.npz` file
+
+        Parameters
+        ----------
+        filename: str
+            Output file name
+        """
+        np.savez_compressed(filename,
+                            columns=np.array(self.columns or [], dtype=object),
+                            start=np.array([] if self._start is None else [self._start],
+                                           dtype='datetime64[D]'),
+                            daily=self._daily,
+                            aggs=np.array(self.aggs),
+                            serials=self._serials)
+        return
+
+
+    @classmethod
+    def load(cls, filename):
+        """ Load a pyramid written by `save()` and rebuild its levels
+
+        Parameters
+        ----------
+        filename: str
+            File written by `TmRollupPyramid.save()`
+
+        Returns
+        -------
+        `TmRollupPyramid` object
+        """
+        data = np.load(filename, allow_pickle=True)
+        pyramid = cls(columns=list(data['columns']) or None, aggs=tuple(data['aggs']))
+        pyramid._daily = data['daily']
+        pyramid._serials = data['serials']
+
+        # Nothing to rebuild if the pyramid was saved before any update
+        if len(pyramid._daily) > 0:
+            pyramid._start = pd.Timestamp(np.atleast_1d(data['start'])[0])
+            pyramid._prefix = np.zeros((1, len(pyramid.columns)))
+            pyramid._update_levels(0)
+
+        return pyramid
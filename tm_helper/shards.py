@@ -0,0 +1,216 @@
+import os
+import json
+import numpy as np
+
+
+class TmShardError(ValueError):
+    pass
+
+
+class TmShardWriter:
+
+    def __init__(self, outdir, shard_size=100000):
+        """ Writes features, labels and dates into fixed-size `.npy` shards
+
+        Parameters
+        ----------
+        outdir: str
+            Directory the shards will be written to (created if needed)
+        shard_size: int
+            Number of rows stored in each shard
+        """
+        self.outdir     = outdir
+        self.shard_size = int(shard_size)
+
+        # Buffered rows waiting to be written
+        self._features = []
+        self._labels   = []
+        self._dates    = []
+        self._nbuffer  = 0
+
+        # Summary of shards written so far
+        self._shards    = []
+        self._nfeatures = None
+
+        os.makedirs(self.outdir, exist_ok=True)
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+
+    def add(self, features, labels, dates):
+        """ Append a batch of rows, writing shards as they fill up
+
+        Parameters
+        ----------
+        features: numpy.ndarray
+            (nrows, nfeatures) array of feature values
+        labels: numpy.ndarray
+            (nrows,) array of labels
+        dates: list of datetime.datetime
+            Date associated with each row
+        """
+        features = np.asarray(features, dtype=float)
+        labels   = np.asarray(labels)
+        dates    = np.asarray(dates, dtype='datetime64[ns]')
+
+        # Check that the rows are consistent
+        if features.ndim != 2:
+            raise TmShardError(f'features must be 2D, got shape {features.shape}')
+        if not (len(features) == len(labels) == len(dates)):
+            raise TmShardError('features, labels and dates must have the same length')
+        if self._nfeatures is None:
+            self._nfeatures = features.shape[1]
+        elif features.shape[1] != self._nfeatures:
+            raise TmShardError(f'Expected {self._nfeatures} features, got {features.shape[1]}')
+
+        self._features.append(features)
+        self._labels.append(labels)
+        self._dates.append(dates)
+        self._nbuffer += len(features)
+
+        # Write out all of the full shards
+        while self._nbuffer >= self.shard_size:
+            self._flush(self.shard_size)
+
+        return
+
+
+    def _flush(self, nrows):
+        """ Write the first `nrows` buffered rows to a new shard
+        """
+        features = np.concatenate(self._features)
+        labels   = np.concatenate(self._labels)
+        dates    = np.concatenate(self._dates)
+
+        # Save the shard
+        name = f'shard_{len(self._shards):05d}'
+        np.save(os.path.join(self.outdir, name + '_features.npy'), features[:nrows])
+        np.save(os.path.join(self.outdir, name + '_labels.npy'), labels[:nrows])
+        np.save(os.path.join(self.outdir, name + '_dates.npy'), dates[:nrows])
+        self._shards.append({'name': name, 'nrows': int(nrows)})
+
+        # Keep whatever is left over
+        self._features = [features[nrows:]]
+        self._labels   = [labels[nrows:]]
+        self._dates    = [dates[nrows:]]
+        self._nbuffer  = len(features) - nrows
+
+        return
+
+
+    def close(self):
+        """ Write any remaining rows and the shard manifest
+        """
+        if self._nbuffer > 0:
+            self._flush(self._nbuffer)
+
+        manifest = {'nfeatures': self._nfeatures,
+                    'nrows':     sum(s['nrows'] for s in self._shards),
+                    'shards':    self._shards}
+        with open(os.path.join(self.outdir, 'manifest.json'), 'w') as f:
+            json.dump(manifest, f, indent=2)
+
+        return
+
+
+class TmShardLoader:
+
+    def __init__(self, outdir):
+        """ Iterates over shards written by `TmShardWriter`
+
+        Parameters
+        ----------
+        outdir: str
+            Directory containing the shards and `manifest.json`
+        """
+        self.outdir = outdir
+
+        try:
+            with open(os.path.join(self.outdir, 'manifest.json'), 'r') as f:
+                self._manifest = json.load(f)
+        except Exception as e:
+            raise TmShardError(e)
+
+
+    def __len__(self):
+        return self._manifest['nrows']
+
+
+    @property
+    def nfeatures(self):
+        return self._manifest['nfeatures']
+
+
+    def load_shard(self, index):
+        """ Memory-map a single shard
+
+        Parameters
+        ----------
+        index: int
+            Index of the shard to load
+
+        Returns
+        -------
+        Tuple of memory-mapped (features, labels, dates) arrays
+        """
+        name = os.path.join(self.outdir, self._manifest['shards'][index]['name'])
+        return (np.load(name + '_features.npy', mmap_mode='r'),
+                np.load(name + '_labels.npy', mmap_mode='r'),
+                np.load(name + '_dates.npy', mmap_mode='r'))
+
+
+    def iter_batches(self, batch_size=1024, shuffle=False, seed=None):
+        """ Iterate over all rows in batches, one shard in memory at a time
+
+        Parameters
+        ----------
+        batch_size: int
+            Number of rows per batch (the final batch may be smaller)
+        shuffle: bool
+            Shuffle the shard order and the rows within each shard
+        seed: int
+            Seed for the random number generator used when shuffling
+
+        Returns
+        -------
+        Generator of (features, labels, dates) tuples
+        """
+        rng = np.random.default_rng(seed)
+        order = np.arange(len(self._manifest['shards']))
+        if shuffle:
+            rng.shuffle(order)
+
+        # Rows carried over between shards so batches stay full
+        carry = None
+        for index in order:
+            features, labels, dates = self.load_shard(index)
+            rows = np.arange(len(features))
+            if shuffle:
+                rng.shuffle(rows)
+
+            for start in range(0, len(rows), batch_size):
+                sel = rows[start:start+batch_size]
+                batch = (features[sel], labels[sel], dates[sel])
+
+                if carry is not None:
+                    batch = tuple(np.concatenate([c, b]) for c,b in zip(carry, batch))
+                    carry = None
+
+                if len(batch[0]) < batch_size:
+                    carry = batch
+                    continue
+                elif len(batch[0]) > batch_size:
+                    carry = tuple(b[batch_size:] for b in batch)
+                    batch = tuple(b[:batch_size] for b in batch)
+
+                yield batch
+
+        if carry is not None and len(carry[0]) > 0:
+            yield carry
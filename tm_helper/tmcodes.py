@@ -27,7 +27,7 @@ class TmCodes:
         self.codes_dir = os.path.dirname(os.path.abspath(__file__)) + '/codes/'
 
 
-    def _load_codes(self, filename, index_col=None):
+    def _load_codes(self, filename, index_col=None, **kwargs):
         """ Loads the codes from `filename` into a pandas dataframe
 
         Parameters
@@ -36,6 +36,8 @@ class TmCodes:
             Filename for codes to be loaded
         index_col: `str` or `int`
             Which column in file to use as index column
+        kwargs:
+            Additional arguments passed to `pandas.read_csv`
         
         Returns
         -------
@@ -43,7 +45,8 @@ class TmCodes:
         """
         return pd.read_csv(self.codes_dir + filename, 
                            index_col=index_col,
-                           skipinitialspace=True) 
+                           skipinitialspace=True,
+                           **kwargs) 
 
 
     def _load_countries(self):
@@ -51,8 +54,11 @@ class TmCodes:
         """
         # Load the country if 
         if self._countries is None:
+            # 'NA' is Namibia, not a missing value
             self._countries = self._load_codes('country_codes.csv', 
-                                               index_col='code')
+                                               index_col='code',
+                                               keep_default_na=False,
+                                               na_values=[''])
         return
 
     def _load_states(self):
@@ -124,7 +130,7 @@ class TmCodes:
         return
 
     def state_id(self, abbrv):
-        """ Returns a country name from a 2-letter abbreviation
+        """ Returns a state id from a 2-letter abbreviation
 
         Parameters
         ----------
@@ -140,11 +146,45 @@ class TmCodes:
 
         # Try to extract the state id
         try:
-            state_id = (self._states['abbr'] == abbrv)[0]
+            state_id = int(self._states.loc[self._states['abbr'] == abbrv, 'id'].iloc[0])
             return state_id
         except Exception as e:
             raise TmCodeError(e)
 
+    def encode_states(self, abbrvs):
+        """ Dictionary-encode a sequence of 2-letter state abbreviations
+
+        Parameters
+        ----------
+        abbrvs: list of `str`
+            2-letter state abbreviations
+        
+        Returns
+        -------
+        numpy.ndarray of row positions in the state table (-1 if unknown)
+        """
+        # Load the state codes
+        self._load_states()
+
+        return pd.Index(self._states['abbr']).get_indexer(pd.Series(abbrvs, dtype=object))
+
+    def encode_countries(self, abbrvs):
+        """ Dictionary-encode a sequence of 2-letter country abbreviations
+
+        Parameters
+        ----------
+        abbrvs: list of `str`
+            2-letter country abbreviations
+        
+        Returns
+        -------
+        numpy.ndarray of row positions in the country table (-1 if unknown)
+        """
+        # Load the country codes
+        self._load_countries()
+
+        return self._countries.index.get_indexer(pd.Series(abbrvs, dtype=object))
+
     def country(self, abbrv):
         """ Returns a country name from a 2-letter abbreviation
 
@@ -219,6 +259,33 @@ class TmCodes:
         return industry_code
 
 
+    def nice_to_industries(self, nice_codes):
+        """ Vectorized version of `nice_to_industry`
+
+        Parameters
+        ----------
+        nice_codes : list of `int`
+            Integers representing Nice Classification codes
+
+        Returns
+        -------
+        numpy.ndarray of industry codes associated with `nice_codes`
+        """
+        # Load the nice classification codes
+        self._load_nice_classes()
+
+        # Try to extract the industry codes
+        try:
+            nice_codes = np.asarray(nice_codes, dtype=int)
+            if np.any(nice_codes < 1):
+                raise IndexError(f'Invalid nice classification in {nice_codes}')
+            industry_codes = np.asarray(self._nice_to_ind)[nice_codes-1]
+        except Exception as e:
+            raise TmCodeError(e)
+
+        return industry_codes
+
+
     def nice_class_descrip(self, nice_code):
         """ Return a description given a nice_code.
 
@@ -243,6 +310,30 @@ class TmCodes:
         return descrip
 
 
+    def status_codes(self, status):
+        """ Return all status codes belonging to a status category
+
+        Parameters
+        ----------
+        status : `str`
+            Status category (e.g. `Dead/Abandoned`). Categories are matched
+            by prefix, so `Dead` returns all dead status codes.
+
+        Returns
+        -------
+        numpy.ndarray of the matching integer status codes
+        """
+        # Load the status codes
+        self._load_status()
+
+        # Find the codes in this category
+        match = self._status['status'].str.startswith(status)
+        if not match.any():
+            raise TmCodeError(f'Unknown status category: {status}')
+
+        return self._status.index[match].values.astype(int)
+
+
     def is_recession(self, dates, forecast_time=dt.timedelta(days=0)):
         """ Return a list of whether the `dates+forecast_time` is during a recession
 